@@ -2,13 +2,31 @@ import os  # Added for file and directory operations
 import hashlib  # Added for hashing files
 import shutil  # Added for file copying and moving
 import signal  # Added for handling interrupts
+import atexit  # Added for saving queued hashes on exit
 import sys  # Added for system-specific parameters and functions
 import logging  # Added for logging
+import logging.handlers  # Added for buffered, rotating log files
 import mimetypes  # Added for MIME type detection
-import pickle  # Added for serialization and deserialization of objects
+import mmap  # Added for hashing large files without copying them
 from tqdm import tqdm  # Added for progress bar
 import argparse  # Added for dynamic file type support
+import functools  # Added for caching MIME type lookups
 import sqlite3  # Added for database support
+import threading  # Added for per-thread read buffers
+import uuid  # Added for unique fallback file names
+import errno  # Added for reporting a full output drive
+from concurrent.futures import ThreadPoolExecutor  # Added for parallel hashing
+from collections import Counter, defaultdict, deque  # Added for grouping files by size and queueing hashes
+
+try:
+    from blake3 import blake3  # Added for faster multithreaded hashing
+except ImportError:
+    blake3 = None  # Fall back to hashlib SHA-256
+
+try:
+    import fcntl  # Added for reflink copies (FICLONE) on Linux
+except ImportError:
+    fcntl = None  # Not available on Windows
 
 
 
@@ -17,6 +35,9 @@ ROOT_DIR = r"C:\Users\chris\Documents\Duplicate_Finder\scripts\TestRoot"  # Root
 OUTPUT_DIR = os.path.join(ROOT_DIR, "FileScanTest")  # Output directory on the same drive
 UNIQUE_DIR = os.path.join(OUTPUT_DIR, "UniqueFiles")
 DUPLICATE_DIR = os.path.join(OUTPUT_DIR, "DuplicateFiles")
+SAME_FS = False  # Whether ROOT_DIR and OUTPUT_DIR share a filesystem (hardlinks possible)
+LINK_MODE = "copy"  # How files are placed in the output folders, set from --link-mode
+LAYOUT = "names"  # How files are named in the output folders, set from --layout
 
 
 # Check if root directory exists
@@ -26,19 +47,52 @@ if not os.path.exists(ROOT_DIR):
 
 
 # Logging configuration
+# Records are buffered in memory and written in batches of LOG_BUFFER_RECORDS,
+# or at once for errors; logging flushes the buffer on exit
+LOG_BUFFER_RECORDS = 10000
+_log_file_handler = logging.handlers.RotatingFileHandler(
+    "file_scan.log",                # Log file name
+    maxBytes=50 * 1024 * 1024,      # Start a new log file after 50MB
+    backupCount=3
+)
+_log_file_handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
 logging.basicConfig(
-    filename="file_scan.log",  # Log file name
-    level=logging.DEBUG,       # Set logging level to DEBUG
-    format="%(asctime)s - %(levelname)s - %(message)s"
+    level=logging.INFO,             # Set to logging.DEBUG for per-file messages
+    handlers=[logging.handlers.MemoryHandler(
+        LOG_BUFFER_RECORDS, flushLevel=logging.ERROR, target=_log_file_handler
+    )]
 )
 
 
 # Declarations
 # CHUNK_SIZE = 65536  # 64KB
-CHUNK_SIZE = 1024 * 1024  # 1MB
+# CHUNK_SIZE = 1024 * 1024  # 1MB
+CHUNK_SIZE = 1024 * 1024 * 4  # 4MB
 # CHUNK_SIZE = 1024 * 1024 * 10  # 10MB
 # CHUNK_SIZE = 1024 * 1024 * 100  # 100MB
-SAVE_INTERVAL = 10  # Save progress every 10 files
+FLUSH_INTERVAL = 10000  # Write queued hashes to the database every 10000 rows
+PENDING_SQL = {  # Statements used by flush_pending for each queued table, run in this order
+    "hashes": "INSERT OR IGNORE INTO hashes (hash, filepath, size) VALUES (?, ?, ?)",
+    "file_meta": "INSERT OR REPLACE INTO file_meta (path, size, mtime_ns, hash) VALUES (?, ?, ?, ?)",
+    # Deletes come first: a row is only deleted for a stale record, and a new
+    # record for the same path queued in the same batch must survive it
+    "unhashed_delete": "DELETE FROM unhashed WHERE path = ?",
+    "unhashed": "INSERT OR REPLACE INTO unhashed (path, size, mtime_ns) VALUES (?, ?, ?)",
+}
+COMPARE_PROBE = 4096  # Bytes compared at each end of a file before the full compare
+HASH_WORKERS = os.cpu_count() or 1  # Number of files hashed concurrently, overridden by --jobs
+HASH_QUEUE_PER_WORKER = 4  # Files queued for hashing (and prefetched) per worker
+PREFETCH_SIZE = 8 * 1024 * 1024  # Read ahead the first 8MB of each queued file
+MMAP_THRESHOLD = 16 * 1024 * 1024  # SHA-256 memory-maps files of at least 16MB
+PARTIAL_SIZE = 64 * 1024  # Bytes compared before fully hashing same-size files
+_thread_state = threading.local()  # Per-thread read buffer, see get_read_buffer
+HASH_ALGORITHM = "blake3" if blake3 is not None else "sha256"  # Overridden by --hash
+SCHEMA_VERSION = 6  # Bump when stored hashes are no longer comparable
+MAX_SUFFIX_ATTEMPTS = 16  # Numbered copies of a name before random suffixes are used
+DISK_RECHECK_BYTES = 1024 * 1024 * 1024  # Query free space again after 1GB copied
+DISK_RECHECK_FILES = 1000  # ... or after 1000 files
+DISK_SPACE_MARGIN = 100 * 1024 * 1024  # ... or when the estimate drops below 100MB
+FICLONE = 0x40049409  # Linux ioctl that shares a file's extents (btrfs, XFS)
 
 
 # Default file types to include (can be overridden by user input)
@@ -65,6 +119,21 @@ DEFAULT_FILE_EXTENSIONS = {
         ".stl", ".obj", ".gcode"  # Add 3D printing file extensions
         }  # Default file types to include
 
+# File type groups used to organize the UniqueFiles folder
+FILE_TYPE_GROUPS = {
+    "Documents": {".txt", ".log", ".md", ".csv", ".json", ".xml", ".html", ".css", ".js",
+                  ".doc", ".docx", ".pdf", ".ppt", ".pptx", ".xls", ".xlsx"},
+    "Images": {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tiff", ".webp"},
+    "Audio": {".mp3", ".wav", ".flac", ".aac", ".ogg", ".wma"},
+    "Videos": {".mp4", ".avi", ".mov", ".wmv", ".flv", ".mkv", ".mpg", ".mpeg"},
+    "Archives": {".zip", ".tar", ".gz", ".bz2", ".xz", ".rar", ".7z"},
+    "Executables": {".exe", ".msi", ".apk", ".dmg", ".iso", ".bin", ".img"},
+    "Code": {".py", ".java", ".c", ".cpp", ".h", ".cs", ".go", ".rb"},
+    "Fonts": {".ttf", ".otf", ".woff", ".woff2", ".eot", ".svgz"},
+    "3DPrinting": {".stl", ".obj", ".gcode"},
+}  # Files that match no group go to "Other"
+EXT_TO_GROUP = {ext: group for group, exts in FILE_TYPE_GROUPS.items() for ext in exts}
+
 # Create output folders if they don't exist
 if not os.path.exists(UNIQUE_DIR):
     os.makedirs(UNIQUE_DIR)
@@ -91,7 +160,7 @@ def parse_arguments():
         "--extensions",
         nargs="+",
         default=list(DEFAULT_FILE_EXTENSIONS),
-        help="File extensions to include (e.g., .txt .log .md). Default is image file types."
+        help="File extensions to include (e.g., .txt .log .md; the dot is optional). Default is image file types."
     )
     parser.add_argument(
         "--root-dir",
@@ -108,14 +177,72 @@ def parse_arguments():
         action="store_true",
         help="Run the script without copying files or modifying the database."
     )
+    parser.add_argument(
+        "--hash",
+        choices=["blake3", "sha256"],
+        default=HASH_ALGORITHM,
+        help=f"Hash algorithm used to identify duplicates. Default is {HASH_ALGORITHM}."
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="Number of files hashed in parallel. Default is 1 on hard disks, otherwise the number of CPUs."
+    )
+    parser.add_argument(
+        "--link-mode",
+        choices=["auto", "copy", "hardlink", "reflink"],
+        default="auto",
+        help="How files are placed in the output folders. 'auto' hardlinks when the output "
+             "directory is on the same filesystem as the root directory, otherwise copies."
+    )
+    parser.add_argument(
+        "--layout",
+        choices=["names", "hash"],
+        default="names",
+        help="Output naming. 'names' keeps file names, adding a suffix on conflicts. 'hash' stores "
+             "each file under its content hash (e.g., ab/cdef....jpg), which needs every file hashed."
+    )
+    parser.add_argument(
+        "--enable-mime",
+        action="store_true",
+        help="Also include files whose extension is not listed but whose MIME type matches a listed extension."
+    )
     parser.add_argument(
         "--clear-hashes",
         action="store_true",
-        help="Clear the hash database and progress file before starting."
+        help="Clear the hash database before starting."
     )
     return parser.parse_args()
 
 
+def is_rotational(path):
+    """
+    Checks whether a path is stored on a spinning hard disk.
+
+    Only Linux exposes this (through /sys/dev/block), so other platforms
+    report it as unknown.
+
+    Args:
+        path (str): A path on the drive to check.
+
+    Returns:
+        bool: True for a hard disk, False for an SSD, or None if unknown.
+    """
+    try:
+        dev = os.stat(path).st_dev
+        block = f"/sys/dev/block/{os.major(dev)}:{os.minor(dev)}"
+        # Partitions have no queue of their own; it lives on the parent disk
+        for queue in (os.path.join(block, "queue"), os.path.join(block, "..", "queue")):
+            rotational = os.path.join(queue, "rotational")
+            if os.path.exists(rotational):
+                with open(rotational) as f:
+                    return f.read().strip() == "1"
+    except (OSError, AttributeError):  # os.major is missing on Windows
+        pass
+    return None
+
+
 # This function checks if the drive has enough free space for the operation.
 def check_disk_space(path, required_space):
     """
@@ -132,105 +259,642 @@ def check_disk_space(path, required_space):
     return free >= required_space
 
 
+def disk_space_checker_factory(path, recheck_bytes=DISK_RECHECK_BYTES, recheck_files=DISK_RECHECK_FILES):
+    """
+    Creates a cheap stand-in for calling `check_disk_space` before every copy.
+
+    The checker queries the drive once, then estimates the free space by
+    subtracting the size of each file it approves. The drive is queried
+    again after `recheck_bytes` bytes or `recheck_files` files, or whenever
+    the estimate drops below max(file size, DISK_SPACE_MARGIN), so a large
+    file is always checked against the real free space.
+
+    Args:
+        path (str): The path on the drive to check.
+        recheck_bytes (int): Bytes approved between queries.
+        recheck_files (int): Files approved between queries.
+
+    Returns:
+        function: has_space(required_space) -> bool.
+    """
+    state = {"free": 0, "bytes": recheck_bytes, "files": recheck_files}  # Forces a first query
+
+    def has_space(required_space):
+        if (state["bytes"] >= recheck_bytes or state["files"] >= recheck_files
+                or state["free"] < max(required_space, DISK_SPACE_MARGIN)):
+            state["free"] = shutil.disk_usage(path)[2]
+            state["bytes"] = state["files"] = 0
+        if state["free"] < required_space:
+            return False
+        state["free"] -= required_space
+        state["bytes"] += required_space
+        state["files"] += 1
+        return True
+    return has_space
+
+
 # Check disk space before starting the scan
 if not check_disk_space(OUTPUT_DIR, 100 * 1024 * 1024):  # 100MB threshold
     print("Insufficient disk space on the output drive.")
     sys.exit(1)
 
 
-def hash_file(filepath, chunk_size=CHUNK_SIZE):
+def get_read_buffer(size):
     """
-    Generates a SHA-256 hash for the given file.
+    Returns a reusable read buffer of the given size for the calling thread.
+
+    Each hashing thread keeps its own buffer, so reading a file allocates
+    nothing per chunk and threads never share a buffer.
+
+    Args:
+        size (int): Size of the buffer in bytes.
+
+    Returns:
+        memoryview: A writable view of the thread's buffer.
+    """
+    view = getattr(_thread_state, "buffer", None)
+    if view is None or len(view) != size:
+        view = _thread_state.buffer = memoryview(bytearray(size))
+    return view
+
+
+def hash_file(filepath, chunk_size=CHUNK_SIZE, algorithm=None):
+    """
+    Generates a BLAKE3 or SHA-256 hash for the given file.
+
+    BLAKE3 memory-maps the file and hashes it across all cores. SHA-256 is
+    used when selected with --hash, or if the `blake3` package is not installed;
+    it memory-maps files of at least MMAP_THRESHOLD bytes and reads smaller
+    ones in chunks.
 
     Args:
         filepath (str): Path to the file to hash.
-        chunk_size (int): Size of chunks to read from the file.
+        chunk_size (int): Size of chunks to read from the file (SHA-256 only).
+        algorithm (str): "blake3" or "sha256". Defaults to HASH_ALGORITHM.
 
     Returns:
-        str: The hexadecimal hash of the file, or None if an error occurs.
+        bytes: The raw 32-byte digest of the file, or None if an error occurs.
     """
-    hasher = hashlib.sha256()
     try:
-        with open(filepath, "rb") as f:
-            for chunk in iter(lambda: f.read(chunk_size), b""):
-                hasher.update(chunk)
-        return hasher.hexdigest()
-        
+        if (algorithm or HASH_ALGORITHM) == "blake3":
+            return blake3(max_threads=blake3.AUTO).update_mmap(filepath).digest()
+
+        # Read straight into the thread's buffer, skipping the BufferedReader layer
+        with open(filepath, "rb", buffering=0) as f:
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)  # Larger readahead
+            hasher = hashlib.sha256()
+
+            # Large files are hashed straight from the page cache in one call
+            if os.fstat(f.fileno()).st_size >= MMAP_THRESHOLD:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    if hasattr(mm, "madvise"):  # Not available on Windows
+                        mm.madvise(mmap.MADV_SEQUENTIAL)
+                    hasher.update(mm)
+                return hasher.digest()
+
+            view = get_read_buffer(chunk_size)
+            while True:
+                n = f.readinto(view)
+                if not n:
+                    break
+                hasher.update(view[:n])
+            return hasher.digest()
+
     except Exception as e:
         logging.error(f"Error hashing {filepath}: {e}")
         return None
 
 
-def is_valid_file(filename, extensions):
+def hash_file_prefix(filepath, length=PARTIAL_SIZE):
+    """
+    Generates a quick hash of the first bytes of a file.
+
+    Files of the same size whose prefixes differ cannot be duplicates, so this
+    rules most of them out after reading only `length` bytes.
+
+    Args:
+        filepath (str): Path to the file to hash.
+        length (int): Number of bytes to hash from the start of the file.
+
+    Returns:
+        bytes: A 16-byte digest of the prefix, or None if an error occurs.
+    """
+    try:
+        with open(filepath, "rb", buffering=0) as f:
+            return hashlib.blake2b(f.read(length), digest_size=16).digest()
+    except Exception as e:
+        logging.error(f"Error hashing {filepath}: {e}")
+        return None
+
+
+def find_unique_prefixes(candidates):
+    """
+    Finds the files whose size and prefix hash match no other candidate.
+
+    Args:
+        candidates (list): (path, size) tuples of files that share a size.
+
+    Returns:
+        set: Paths of the files that cannot have a duplicate among the candidates.
+    """
+    with ThreadPoolExecutor(max_workers=HASH_WORKERS) as executor:
+        prefixes = list(executor.map(hash_file_prefix, [path for path, _ in candidates]))
+    groups = Counter((size, prefix) for (_, size), prefix in zip(candidates, prefixes))
+    return {
+        path for (path, size), prefix in zip(candidates, prefixes)
+        if prefix is not None and groups[(size, prefix)] == 1
+    }
+
+
+def prefetch_file(filepath, length=PREFETCH_SIZE):
+    """
+    Asks the kernel to start reading the beginning of a file in the background.
+
+    This is only a hint, so errors are ignored. It does nothing on platforms
+    without `os.posix_fadvise` (e.g. Windows).
+
+    Args:
+        filepath (str): Path to the file that will be read soon.
+        length (int): Number of bytes from the start of the file to read ahead.
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return
+    try:
+        fd = os.open(filepath, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, length, os.POSIX_FADV_WILLNEED)
+        finally:
+            os.close(fd)
+    except OSError:
+        pass
+
+
+def file_has_size(filepath, size):
+    """
+    Checks that a file still exists with the size it was recorded with.
+
+    Args:
+        filepath (str): Path to the file.
+        size (int): The expected size in bytes.
+
+    Returns:
+        bool: True if the file exists and has that size.
+    """
+    try:
+        return os.path.getsize(filepath) == size
+    except OSError:
+        return False
+
+
+def drop_page_cache(filepath):
+    """
+    Tells the kernel that the cached pages of a file will not be needed again.
+
+    A long scan reads every file once, which would otherwise evict more
+    useful data from the page cache. This is only a hint, so errors are
+    ignored. It does nothing on platforms without `os.posix_fadvise`.
+
+    Args:
+        filepath (str or int): Path to the file that is no longer needed, or
+                               a descriptor already open on it.
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return
+    try:
+        if isinstance(filepath, int):
+            os.posix_fadvise(filepath, 0, 0, os.POSIX_FADV_DONTNEED)
+            return
+        fd = os.open(filepath, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+    except OSError:
+        pass
+
+
+def iter_hashes(executor, paths, queue_depth=None):
+    """
+    Hashes files on an executor, yielding the results in input order.
+
+    At most `queue_depth` files are queued at a time. Each file is prefetched
+    when it is queued, so the disk is already reading the next files while the
+    workers hash the current ones, without holding a future for every file.
+
+    Args:
+        executor (concurrent.futures.Executor): The executor running `hash_file`.
+        paths (list): Paths of the files to hash.
+        queue_depth (int): Maximum number of files submitted but not yet consumed.
+                           Defaults to HASH_QUEUE_PER_WORKER per hashing worker.
+
+    Yields:
+        bytes: The digest of each file (or None if it could not be hashed).
+    """
+    queue_depth = queue_depth or HASH_WORKERS * HASH_QUEUE_PER_WORKER
+    queue = deque()
+    for path in paths:
+        if len(queue) >= queue_depth:
+            yield queue.popleft().result()
+        prefetch_file(path)
+        queue.append(executor.submit(hash_file, path))
+    while queue:
+        yield queue.popleft().result()
+
+
+def is_valid_file(filename, extensions, mime_types=None):
     """
     Checks if a file is valid based on its extension or MIME type.
 
     Args:
         filename (str): The name of the file to check.
-        extensions (set): A set of valid file extensions.
+        extensions (frozenset): A set of valid lowercase file extensions.
+        mime_types (frozenset, optional): MIME types to accept for files whose
+                                          extension is not listed (see --enable-mime).
 
     Returns:
         bool: True if the file is valid, False otherwise.
     """
-    ext = os.path.splitext(filename.lower())[1]
+    # Slicing the suffix and looking it up in a frozenset is about twice as fast
+    # as a compiled alternation regex, whose search has to scan the whole name
+    dot = filename.rfind(".")
+    ext = filename[dot:].lower() if dot >= 0 else ""
     if ext in extensions:
         return True
 
-    # Allow files without extensions or with unknown extensions
-    if not ext:  # Files without extensions
-        return True
+    # Fall back to the MIME type only when requested, since guess_type is slow
+    if mime_types:
+        return _mime_type_ok(ext, mime_types)
+    return False
+
+
+@functools.lru_cache(maxsize=256)
+def _mime_type_ok(ext, mime_types):
+    """
+    Checks whether the MIME type of an extension is one of the given types.
+
+    Cached per extension, since a scan sees the same few extensions over and over.
+    """
+    return mimetypes.guess_type("file" + ext)[0] in mime_types
+
+
+def mime_types_for(extensions):
+    """
+    Returns the MIME types of the given file extensions.
 
-    # Allow files with unknown extensions
-    return True
+    Args:
+        extensions (frozenset): A set of file extensions.
+
+    Returns:
+        frozenset: The known MIME types for the extensions.
+    """
+    return frozenset(filter(None, (mimetypes.guess_type("file" + ext)[0] for ext in extensions)))
+
+
+def copy_file(src, dest_path, mode="copy", has_space=None):
+    """
+    Copies a file using the cheapest method the filesystem supports.
+
+    A hardlink or reflink is tried first when requested; neither writes any
+    file data. On Linux, `os.copy_file_range` lets the kernel copy (or
+    reflink, on CoW filesystems) the data without passing it through user
+    space. Otherwise, or if those fail, the data is copied in CHUNK_SIZE
+    blocks, and the file's metadata is copied as with `shutil.copy2`.
+
+    The destination is created exclusively, so an existing file is never
+    overwritten. Free space is only checked before copying data, since a
+    hardlink or reflink uses none.
 
+    Args:
+        src (str): Path to the source file.
+        dest_path (str): Path of the file to create.
+        mode (str): "hardlink", "reflink" or "copy". Hardlinks and reflinks
+                    need both paths on the same filesystem.
+        has_space (function, optional): Disk space checker from
+                                        `disk_space_checker_factory`. Without
+                                        it, the drive is queried for this file.
 
-def safe_copy(src, dest_dir, hashes, delete_original=False):
+    Raises:
+        FileExistsError: If dest_path already exists.
+        OSError: With errno.ENOSPC if there is not enough space to copy the data.
+    """
+    if mode == "hardlink":
+        try:
+            os.link(src, dest_path)
+            return
+        except FileExistsError:
+            raise
+        except OSError as e:
+            logging.debug(f"Hardlink failed for {src}, copying instead: {e}")
+
+    # Claim the name atomically; once created, the file is ours to fill
+    fd = os.open(dest_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0), 0o644)
+    try:
+        with open(fd, "wb") as fdst, open(src, "rb") as fsrc:
+            done = reflinked = False
+            if mode == "reflink" and fcntl is not None:
+                try:
+                    fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+                    done = reflinked = True
+                except OSError as e:
+                    logging.debug(f"Reflink failed for {src}, copying instead: {e}")
+
+            size = os.fstat(fsrc.fileno()).st_size
+            if not done and not (has_space(size) if has_space else check_disk_space(OUTPUT_DIR, size)):
+                raise OSError(errno.ENOSPC, "Insufficient disk space to copy", src)
+
+            if not done and hasattr(os, "copy_file_range"):
+                try:
+                    remaining = size
+                    while remaining > 0:
+                        copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                        if not copied:
+                            break
+                        remaining -= copied
+                    done = remaining <= 0
+                except OSError as e:
+                    logging.debug(f"copy_file_range failed for {src}, copying instead: {e}")
+
+            if not done:
+                # Start over in case copy_file_range stopped part way
+                fsrc.seek(0)
+                fdst.seek(0)
+                fdst.truncate()
+                shutil.copyfileobj(fsrc, fdst, CHUNK_SIZE)
+
+            # The data was read for the copy (a reflink reads nothing); keep it
+            # from crowding the page cache
+            if not reflinked:
+                drop_page_cache(fsrc.fileno())
+    except BaseException:
+        os.remove(dest_path)  # Do not leave a partial copy behind
+        raise
+    shutil.copystat(src, dest_path)
+
+
+def safe_copy(src, dest_dir, src_hash, dest_index, delete_original=False, mode=None, has_space=None):
     """
     Copies a file to the destination directory, ensuring no filename conflicts.
     Optionally deletes the original file after copying.
 
+    Each basename remembers the names it has taken in the directory
+    (`name`, `name_1`, `name_2`, ...), so a conflict checks those directly
+    instead of probing for a free name. A taken name is only hashed when
+    its size matches the source. Beyond MAX_SUFFIX_ATTEMPTS numbered copies,
+    a random suffix (`name_u` and 8 hex digits) is used instead.
+
     Args:
         src (str): Path to the source file.
         dest_dir (str): Path to the destination directory.
-        hashes (dict): Dictionary of hashes to file paths.
+        src_hash (bytes): Hash of the source file, or None if it was not hashed.
+                        It is then only computed if a name conflict needs it.
+        dest_index (dict): Maps each destination directory to a tuple of
+                           (name -> [size, hash, (st_dev, st_ino)], None until
+                           first needed; basename -> names taken for it).
+                           Filled lazily so every destination file is hashed
+                           at most once, and hardlinks to the source not at all.
         delete_original (bool): Whether to delete the original file after copying.
+        mode (str): How to place the file (see `copy_file`). Defaults to LINK_MODE.
+        has_space (function, optional): Disk space checker from
+                                        `disk_space_checker_factory`. Without
+                                        it, the drive is queried for this file.
     """
-    base = os.path.basename(src)
-    dest_path = os.path.join(dest_dir, base)
-    src_hash = hash_file(src)  # Compute once
-    if src_hash is None:
+    if LAYOUT == "hash":
+        content_addressed_copy(src, dest_dir, src_hash, delete_original, mode, has_space)
         return
 
-    if not check_disk_space(OUTPUT_DIR, os.path.getsize(src)):
-        logging.error(f"Insufficient disk space to copy {src}")
-        return
-
-    i = 1
-    max_attempts = 1000
-    while os.path.exists(dest_path) and i <= max_attempts:
-        existing_hash = hash_file(dest_path)
-        if existing_hash == src_hash:
-            if not files_are_identical(dest_path, src):
-                logging.warning(f"Hash collision detected between {dest_path} and {src}")
-            else:
+    base = os.path.basename(src)
+    if dest_dir not in dest_index:
+        os.makedirs(dest_dir, exist_ok=True)
+        dest_index[dest_dir] = (dict.fromkeys(os.listdir(dest_dir)), {})
+    dest_files, taken_names = dest_index[dest_dir]
+    name, ext = os.path.splitext(base)
+
+    taken = taken_names.get(base)
+    if taken is None:
+        # First file with this name here: collect the numbered copies already present
+        taken = taken_names[base] = []
+        dest_name = base
+        while dest_name in dest_files:
+            taken.append(dest_name)
+            dest_name = f"{name}_{len(taken)}{ext}"
+        if len(taken) > MAX_SUFFIX_ATTEMPTS:
+            # Also pick up the random-suffix copies made by earlier runs
+            prefix = f"{name}_"
+            taken.extend(
+                f for f in dest_files
+                if len(f) == len(prefix) + 9 + len(ext) and f.startswith(prefix + "u") and f.endswith(ext)
+                and all(c in "0123456789abcdef" for c in f[len(prefix) + 1:len(prefix) + 9])
+            )
+
+    src_st = os.stat(src)
+    src_size = src_st.st_size
+    checked = 0
+    while True:
+        # Compare against every name taken so far; files of another size cannot match
+        for dest_name in taken[checked:]:
+            dest_path = os.path.join(dest_dir, dest_name)
+            entry = dest_files.get(dest_name)
+            if entry is None:
+                try:
+                    st = os.stat(dest_path)
+                except OSError:
+                    continue
+                entry = dest_files[dest_name] = [st.st_size, None, (st.st_dev, st.st_ino)]
+            if entry[0] != src_size:
+                continue
+            if entry[2] == (src_st.st_dev, src_st.st_ino):
+                # A hardlink to the source, e.g. placed by an earlier run
                 logging.info(f"File already exists in destination: {dest_path}")
                 return
-            
-        name, ext = os.path.splitext(base)
-        dest_path = os.path.join(dest_dir, f"{name}_{i}{ext}")
-        i += 1
-    if i > max_attempts:
-        logging.error(f"Exceeded maximum attempts to create a unique filename for {src}")
-        return
-    
+            if src_hash is None:
+                src_hash = hash_file(src)
+                if src_hash is None:
+                    return
+            if entry[1] is None:
+                entry[1] = hash_file(dest_path)
+            if entry[1] == src_hash:
+                if not files_are_identical(dest_path, src):
+                    logging.warning(f"Hash collision detected between {dest_path} and {src}")
+                else:
+                    logging.info(f"File already exists in destination: {dest_path}")
+                    return
+        checked = len(taken)
+
+        if not taken:
+            dest_name = base
+        elif len(taken) <= MAX_SUFFIX_ATTEMPTS:
+            dest_name = f"{name}_{len(taken)}{ext}"
+        else:
+            # The "u" keeps a random suffix from ever looking like a number
+            dest_name = f"{name}_u{uuid.uuid4().hex[:8]}{ext}"
+        taken.append(dest_name)
+        if dest_name in dest_files:
+            continue  # Taken by a file with another basename
+
+        dest_path = os.path.join(dest_dir, dest_name)
+        try:
+            copy_file(src, dest_path, mode or LINK_MODE, has_space)
+            dest_files[dest_name] = [src_size, src_hash, None]
+            break
+        except FileExistsError:
+            dest_files[dest_name] = None  # Created since the directory was listed
+        except OSError as e:
+            if e.errno == errno.ENOSPC:
+                raise  # Counted as skipped by the caller
+            logging.error(f"Error copying {src} to {dest_path}: {e}")
+            print(f"Error copying {src} to {dest_path}: {e}")
+            return
+        except Exception as e:
+            logging.error(f"Error copying {src} to {dest_path}: {e}")
+            print(f"Error copying {src} to {dest_path}: {e}")
+            return
+
+    if delete_original:
+        remove_original(src)
+
+
+def content_addressed_copy(src, dest_dir, src_hash, delete_original=False, mode=None, has_space=None):
+    """
+    Copies a file to `dest_dir/<first 2 hex digits>/<rest of hash><ext>`.
+
+    The path follows from the content, so there are no name conflicts to
+    resolve and no destination file is ever hashed: a file already at the
+    path has the same hash by construction.
+
+    Args:
+        src (str): Path to the source file.
+        dest_dir (str): Path to the destination directory.
+        src_hash (bytes): Hash of the source file, or None to compute it here.
+        delete_original (bool): Whether to delete the original file after copying.
+        mode (str): How to place the file (see `copy_file`). Defaults to LINK_MODE.
+        has_space (function, optional): Disk space checker from
+                                        `disk_space_checker_factory`. Without
+                                        it, the drive is queried for this file.
+    """
+    if src_hash is None:
+        src_hash = hash_file(src)
+        if src_hash is None:
+            return
+    digest = src_hash.hex()
+    dest_path = os.path.join(dest_dir, digest[:2], digest[2:] + os.path.splitext(src)[1].lower())
+
+    src_size = os.path.getsize(src)
     try:
-        shutil.copy2(src, dest_path)
-        if delete_original:
-            os.remove(src)
-            logging.info(f"Deleted original file: {src}")
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        copy_file(src, dest_path, mode or LINK_MODE, has_space)
+    except FileExistsError:
+        # Same hash by construction; the size guards against a truncated earlier copy
+        if os.path.getsize(dest_path) != src_size:
+            logging.warning(f"Size mismatch for existing {dest_path}, keeping it: {src}")
+            return
+        logging.info(f"File already exists in destination: {dest_path}")
+        return
+    except OSError as e:
+        if e.errno == errno.ENOSPC:
+            raise  # Counted as skipped by the caller
+        logging.error(f"Error copying {src} to {dest_path}: {e}")
+        print(f"Error copying {src} to {dest_path}: {e}")
+        return
     except Exception as e:
         logging.error(f"Error copying {src} to {dest_path}: {e}")
         print(f"Error copying {src} to {dest_path}: {e}")
+        return
+
+    if delete_original:
+        remove_original(src)
+
+
+def remove_original(src):
+    """
+    Deletes a source file after it has been copied, logging any error.
+
+    Args:
+        src (str): Path to the file to delete.
+    """
+    try:
+        os.remove(src)
+        logging.info(f"Deleted original file: {src}")
+    except OSError as e:
+        logging.error(f"Error deleting {src}: {e}")
+
+
+def walk_scandir(root_dir, exclude=frozenset()):
+    """
+    Yields the file entries below a directory using `os.scandir`.
+
+    Each directory is listed once, and the returned `os.DirEntry` objects carry
+    the name, path and (on Windows, without any extra syscall) the stat result.
+    Symbolic links to directories are skipped. Directories are walked
+    depth-first from an explicit stack, so deep trees cannot hit the
+    recursion limit.
+
+    Args:
+        root_dir (str): The directory to walk.
+        exclude (frozenset): Normalized absolute paths of directories whose
+                             subtrees are pruned from the walk.
+
+    Yields:
+        os.DirEntry: Each non-directory entry found in the tree.
+    """
+    # Starting from an absolute path makes every entry.path absolute (and
+    # normalized), so pruning needs no per-directory abspath call
+    stack = [os.path.abspath(root_dir)]
+    while stack:
+        dirpath = stack.pop()
+        subdirs = []
+        try:
+            with os.scandir(dirpath) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if os.path.normcase(entry.path) not in exclude:
+                            subdirs.append(entry.path)
+                    elif entry.is_symlink() and entry.is_dir():
+                        logging.warning(f"Skipping symbolic link: {entry.path}")
+                    else:
+                        yield entry
+        except OSError as e:
+            logging.error(f"Error scanning {dirpath}: {e}")
+        # Reversed so subdirectories are popped, and walked, in listing order
+        stack.extend(reversed(subdirs))
+
+
+def pass1_stat(root_dir, extensions):
+    """
+    Walks a directory tree and records the size of every file that should be scanned.
+
+    Sizes come from the directory entries returned by `walk_scandir`, so no file
+    is opened. The output directories, hidden files and files that are not
+    regular files are skipped.
+
+    Args:
+        root_dir (str): The root directory to scan for files.
+        extensions (frozenset): A set of valid lowercase file extensions.
+
+    Returns:
+        tuple: (files, size_to_paths) where files is a list of (path, size, mtime_ns)
+               tuples in walk order and size_to_paths maps each size to its file paths.
+    """
+    mime_types = mime_types_for(extensions) if args.enable_mime else None
+    # Prune the output directories so their contents are never listed.
+    output_dirs = frozenset(os.path.normcase(os.path.abspath(d)) for d in (UNIQUE_DIR, DUPLICATE_DIR))
+    files = []
+    size_to_paths = defaultdict(list)
+    # The total is unknown until the walk ends, so show a running count instead
+    for entry in tqdm(walk_scandir(root_dir, output_dirs), desc="Scanning files", unit="file"):
+        name = entry.name
+        if name[:1] == "." or not is_valid_file(name, extensions, mime_types):
+            continue
+        try:
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            st = entry.stat(follow_symlinks=False)
+        except OSError as e:
+            logging.error(f"Error reading {entry.path}: {e}")
+            continue
+        files.append((entry.path, st.st_size, st.st_mtime_ns))
+        size_to_paths[st.st_size].append(entry.path)
+    return files, size_to_paths
 
 
 def scan_and_copy_files(root_dir, extensions):
@@ -248,72 +912,196 @@ def scan_and_copy_files(root_dir, extensions):
     Returns:
         tuple: (processed_files, skipped_files)
     """
-    # Precompute total_files accurately
-    total_files = sum(
-        1 for dirpath, _, filenames in os.walk(root_dir)
-        for fname in filenames if is_valid_file(fname, extensions) and not fname.startswith(".")
-    )
+    # Absolute paths keep the file_meta cache valid whatever the working directory
+    files, size_to_paths = pass1_stat(os.path.abspath(root_dir), extensions)
+    total_files = len(files)
+
+    if args.dry_run:
+        # Nothing is read or written in a dry run; the sizes alone show what could be a duplicate
+        conn = open_database_readonly()
+        known_sizes = load_known_sizes(conn, size_to_paths)[0] if conn else set()
+        if conn:
+            conn.close()
+        report_dry_run(files, size_to_paths, known_sizes)
+        return total_files, 0
 
     conn = initialize_database()
+    known_sizes, stored_to_hash, stored_in_scan = load_known_sizes(conn, size_to_paths)
     hashes = load_hashes_from_db(conn)
+    file_meta = load_file_meta_from_db(conn)
     skipped_files = 0
     processed_files = 0
 
-    # Register the signal handler with the current 'hashes'
-    signal.signal(signal.SIGINT, handle_interrupt_factory(hashes))
-
-    with tqdm(total=total_files, desc="Processing files") as pbar:
-        for dirpath, _, filenames in os.walk(root_dir):
-            if os.path.islink(dirpath):
-                logging.warning(f"Skipping symbolic link: {dirpath}")
-                continue
-
-            # Skip the output directories to avoid redundant checks.
-            if os.path.commonpath([os.path.abspath(dirpath), os.path.abspath(UNIQUE_DIR)]) == os.path.abspath(UNIQUE_DIR) or \
-               os.path.commonpath([os.path.abspath(dirpath), os.path.abspath(DUPLICATE_DIR)]) == os.path.abspath(DUPLICATE_DIR):
-                continue
-
-            batch_count = 0
-            for fname in filenames:
-                if not is_valid_file(fname, extensions) or fname.startswith("."):
+    # A file whose size matches no other file (in this scan or a previous one)
+    # cannot be a duplicate, so only files in shared size buckets are hashed.
+    # Files copied unhashed by an earlier run are hashed below when they share one.
+    # The hash layout names every file by its hash, so there every file is hashed.
+    def needs_hash(size):
+        return LAYOUT == "hash" or len(size_to_paths[size]) > 1 or size in known_sizes
+
+    # Size buckets made only of files an earlier run copied unhashed, all
+    # unchanged since, were fully handled then; nothing about them is read.
+    stored_mtimes = {fpath: mtime_ns for fpath, _, mtime_ns in files if fpath in stored_in_scan}
+    unchanged = set()
+    for size, paths in size_to_paths.items():
+        if size not in known_sizes and all(
+                path in stored_mtimes and stored_mtimes[path] == stored_in_scan[path] for path in paths):
+            unchanged.update(paths)
+    del stored_mtimes
+
+    # Files unchanged since a previous run reuse their stored hash.
+    cached = {}
+    for fpath, size, mtime_ns in files:
+        if needs_hash(size):
+            h = lookup_cached_hash(file_meta, fpath, size, mtime_ns)
+            if h is not None:
+                cached[fpath] = h
+    del file_meta
+
+    # Large files of a size new to the database are first compared by their
+    # first PARTIAL_SIZE bytes. (Any size seen before is in known_sizes, and
+    # its stored hashes have no prefix to compare against.)
+    unique_by_prefix = find_unique_prefixes([
+        (fpath, size) for fpath, size, _ in files
+        if size > PARTIAL_SIZE and needs_hash(size) and size not in known_sizes and fpath not in unchanged
+    ]) if LAYOUT == "names" else set()
+
+    to_hash = [
+        fpath for fpath, size, _ in files
+        if needs_hash(size) and fpath not in cached and fpath not in unique_by_prefix and fpath not in unchanged
+    ]
+    logging.info(f"{len(to_hash) + len(cached) + len(unique_by_prefix)} of {total_files} files share a size "
+                 f"with another file: {len(unique_by_prefix)} ruled out by their first bytes, "
+                 f"hashing {len(to_hash)}, reusing {len(cached)} hashes from the last run")
+
+    pending = new_pending()
+    dest_index = {}
+    has_space = disk_space_checker_factory(OUTPUT_DIR)
+
+    # Register the signal handler with the current connection and queued hashes,
+    # and make sure queued hashes are also written if the scan dies on an error
+    signal.signal(signal.SIGINT, handle_interrupt_factory(conn, pending))
+    atexit.register(flush_pending, conn, pending)
+
+    # Hash files on a thread pool; the hashers release the GIL while reading and
+    # hashing, so several files are in flight at once. The dict, database and
+    # copy updates below stay on this thread to keep duplicate detection ordered.
+    # Progress is counted in bytes, since reading and copying dominate and file sizes vary widely
+    total_bytes = sum(size for _, size, _ in files)
+    log_debug = logging.getLogger().isEnabledFor(logging.DEBUG)  # Skip formatting per-file messages otherwise
+    with tqdm(total=total_bytes, desc="Processing files", unit="B", unit_scale=True, unit_divisor=1024) as pbar, \
+            ThreadPoolExecutor(max_workers=HASH_WORKERS) as executor:
+        # Earlier runs' unhashed files of a size seen again are hashed first, so
+        # a file of this scan with the same content is found to be a duplicate
+        for spath, ssize in stored_to_hash:
+            delete_unhashed_from_db(pending, spath)  # Hashed now, or no longer there
+        stored_to_hash = [(path, size) for path, size in stored_to_hash if file_has_size(path, size)]
+        stored_hashes = iter_hashes(executor, [path for path, _ in stored_to_hash])
+        for (spath, ssize), h in zip(stored_to_hash, stored_hashes):
+            drop_page_cache(spath)
+            if h is not None and h not in hashes:
+                hashes.add(h)
+                save_hash_to_db(pending, h, spath, ssize)
+        del stored_to_hash
+
+        hashed = iter_hashes(executor, to_hash)
+        for fpath, size, mtime_ns in files:
+            pbar.update(size)
+            processed_files += 1
+            if log_debug:
+                logging.debug(f"Processing file {processed_files}/{total_files}: {os.path.basename(fpath)}")
+
+            hashed_now = False  # Only files read here are dropped from the page cache
+            try:
+                if fpath in unchanged:
+                    continue  # Copied by an earlier run and unchanged since
+                if not needs_hash(size) or fpath in unique_by_prefix:
+                    safe_copy(fpath, unique_group_dir(fpath), None, dest_index, has_space=has_space)
+                    save_unhashed_to_db(pending, fpath, size, mtime_ns)
                     continue
 
-                pbar.update(1)
-                processed_files += 1
-                logging.info(f"Processing file {processed_files}/{total_files}: {fname}")
-                fpath = os.path.join(dirpath, fname)
-                h = hash_file(fpath)
+                h = cached.get(fpath)
+                if h is not None and h in hashes:
+                    continue  # Placed by the run that hashed it, and unchanged since
                 if h is None:
-                    skipped_files += 1
-                    continue
-
-                if args.dry_run:
-                    logging.info(f"Dry-run: Would copy {fpath} to {UNIQUE_DIR if h not in hashes else DUPLICATE_DIR}")
-                    continue
+                    h = next(hashed)
+                    hashed_now = True
+                    if h is None:
+                        skipped_files += 1
+                        continue
+                if fpath in stored_in_scan:
+                    delete_unhashed_from_db(pending, fpath)
 
                 if h not in hashes:
-                    hashes[h] = fpath
-                    save_hash_to_db(conn, h, fpath, batch_mode=True)
-                    batch_count += 1
-                    if batch_count % SAVE_INTERVAL == 0:
-                        conn.commit()  # Commit every SAVE_INTERVAL files
-                    safe_copy(fpath, UNIQUE_DIR, hashes)
+                    # Stored after the copy, so a file that could not be copied is retried next run
+                    safe_copy(fpath, unique_group_dir(fpath), h, dest_index, has_space=has_space)
+                    hashes.add(h)
+                    save_hash_to_db(pending, h, fpath, size)
                 else:
-                    safe_copy(fpath, DUPLICATE_DIR, hashes)
-                    logging.info(f"Duplicate found: {fpath} (matches {hashes[h]})")
-                if processed_files % SAVE_INTERVAL == 0:  # Save progress every SAVE_INTERVAL files
-                    save_progress(hashes)
-    conn.commit()  # Final commit at the end
-    save_progress(hashes)
+                    match = load_path_from_db(conn, h) or queued_path(pending, h)
+                    # A file stored by an earlier run as the original is not its own duplicate
+                    if match != fpath:
+                        safe_copy(fpath, DUPLICATE_DIR, h, dest_index, has_space=has_space)
+                        logging.info(f"Duplicate found: {fpath} (matches {match})")
+                if hashed_now:
+                    # Recorded once the file is placed, so a rescan can skip it
+                    save_file_meta_to_db(pending, fpath, size, mtime_ns, h)
+            except OSError as e:
+                # e.g. deleted or renamed since the walk, or no space left to copy it
+                logging.error(f"Error processing {fpath}: {e}")
+                skipped_files += 1
+            finally:
+                # A hashed file is not read again (copy_file drops copied data itself);
+                # keep it from crowding the page cache
+                if hashed_now:
+                    drop_page_cache(fpath)
+                if pending_count(pending) >= FLUSH_INTERVAL:
+                    flush_pending(conn, pending)
+    flush_pending(conn, pending)  # Final commit at the end
     logging.info(f"Total files skipped due to errors: {skipped_files}")
+    atexit.unregister(flush_pending)
     conn.close()  # Close the database connection
     return processed_files, skipped_files
 
 
+def report_dry_run(files, size_to_paths, known_sizes):
+    """
+    Reports what a scan would do, using only the sizes from the directory walk.
+
+    No file is read or hashed. A file whose size matches no other file (in
+    this scan or the hash database) would be copied to UniqueFiles; files
+    that share a size are reported as a group of possible duplicates, since
+    only hashing them would tell.
+
+    Args:
+        files (list): (path, size, mtime_ns) tuples from `pass1_stat`.
+        size_to_paths (dict): Maps each size to its file paths.
+        known_sizes (set): Sizes of files in the hash database.
+    """
+    groups = 0
+    group_bytes = 0
+    for fpath, size, _ in files:
+        if len(size_to_paths[size]) == 1 and size not in known_sizes:
+            logging.info(f"Dry-run: Would copy {fpath} to {unique_group_dir(fpath)}")
+    for size, paths in size_to_paths.items():
+        if len(paths) > 1 or size in known_sizes:
+            groups += 1
+            group_bytes += size * len(paths)
+            previous = " and files from earlier runs" if size in known_sizes else ""
+            logging.info(f"Dry-run: {len(paths)} files of {size} bytes{previous} may be duplicates: "
+                         + ", ".join(paths))
+    print(f"Dry-run: {groups} groups of same-size files ({group_bytes} bytes) may contain duplicates; "
+          f"see file_scan.log for the files.")
+
+
 def files_are_identical(file1, file2):
     """
     Compares two files byte by byte to determine if they are identical.
 
+    Two hardlinks to the same file are identical without reading anything.
+    Otherwise sizes and the first and last COMPARE_PROBE bytes are checked
+    first so that differing files are rejected without streaming them end to end.
+
     Args:
         file1 (str): Path to the first file.
         file2 (str): Path to the second file.
@@ -322,69 +1110,65 @@ def files_are_identical(file1, file2):
         bool: True if the files are identical, False otherwise.
     """
     try:
-        with open(file1, "rb") as f1, open(file2, "rb") as f2:
+        with open(file1, "rb", buffering=0) as f1, open(file2, "rb", buffering=0) as f2:
+            st1 = os.fstat(f1.fileno())
+            st2 = os.fstat(f2.fileno())
+            if (st1.st_dev, st1.st_ino) == (st2.st_dev, st2.st_ino):  # e.g. a hardlinked duplicate
+                return True
+            size = st1.st_size
+            if size != st2.st_size:
+                return False
+
+            if size > COMPARE_PROBE:
+                if f1.read(COMPARE_PROBE) != f2.read(COMPARE_PROBE):
+                    return False
+                f1.seek(-COMPARE_PROBE, os.SEEK_END)
+                f2.seek(-COMPARE_PROBE, os.SEEK_END)
+                if f1.read(COMPARE_PROBE) != f2.read(COMPARE_PROBE):
+                    return False
+                f1.seek(0)
+                f2.seek(0)
+
+            buf1 = bytearray(CHUNK_SIZE)
+            buf2 = bytearray(CHUNK_SIZE)
             while True:
-                chunk1 = f1.read(CHUNK_SIZE)
-                chunk2 = f2.read(CHUNK_SIZE)
-                if chunk1 != chunk2:
+                n1 = f1.readinto(buf1)
+                n2 = f2.readinto(buf2)
+                # On a short read the stale tails of both buffers held equal data
+                if n1 != n2 or buf1 != buf2:
                     return False
-                if not chunk1:  # End of file reached.
+                if not n1:  # End of file reached.
                     return True
     except Exception as e:
         logging.error(f"Error comparing {file1} and {file2}: {e}")
         return False
 
 
-def save_progress(hashes, filename="hashes.pkl"):
-    """
-    Saves the current state of hashes to a file using pickle.
-    """
-    try:
-        with open(filename, "wb") as f:
-            pickle.dump(hashes, f)
-    except Exception as e:
-        logging.error(f"Error saving progress to {filename}: {e}")
-
-
-def handle_interrupt_factory(hashes):
+def handle_interrupt_factory(conn, pending):
     """
     Creates a signal handler for graceful exit on interrupt.
+
+    The handler writes any queued hashes to the database before exiting, so
+    the next run resumes from everything hashed so far. Further interrupts are
+    ignored while it runs so a second Ctrl+C cannot cut the commit short.
     """
-    def handle_interrupt(signal, frame):
+    def handle_interrupt(signum, frame):
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
         print("\nScript interrupted. Saving progress and exiting gracefully...")
-        save_progress(hashes)
+        flush_pending(conn, pending)
+        conn.close()
         sys.exit(0)
     return handle_interrupt
 
 
-def load_progress(filename="hashes.pkl"):
-    """
-    Load progress data from a pickle file.
-
-    This function attempts to load a dictionary of progress data from the specified
-    pickle file. If the file does not exist or an error occurs during loading, 
-    an empty dictionary is returned.
-
-    Args:
-        filename (str): The name of the pickle file to load. Defaults to "hashes.pkl".
-
-    Returns:
-        dict: The loaded progress data as a dictionary, or an empty dictionary if
-              the file does not exist or an error occurs.
-    """
-    try:
-        if os.path.exists(filename):
-            with open(filename, "rb") as f:
-                return pickle.load(f)
-    except Exception as e:
-        logging.error(f"Error loading progress from {filename}: {e}")
-    return {}
-
-
 def initialize_database(db_path="hashes.db"):
     """
     Initializes a SQLite database to store file hashes and their corresponding file paths.
 
+    If the database was written by an older version of the script (see SCHEMA_VERSION),
+    or with a different hash algorithm than HASH_ALGORITHM, the stored hashes are
+    discarded since they are not comparable with new ones.
+
     Args:
         db_path (str): The path to the SQLite database file. Defaults to "hashes.db".
 
@@ -396,8 +1180,29 @@ def initialize_database(db_path="hashes.db"):
     """
     try:
         conn = sqlite3.connect(db_path)
+        conn.execute("PRAGMA journal_mode=WAL")  # Cheaper commits, readers never block the writer
+        conn.execute("PRAGMA synchronous=NORMAL")  # Safe with WAL; skips an fsync per commit
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-65536")  # 64MB page cache keeps the key B-trees in memory
         cursor = conn.cursor()
-        cursor.execute("CREATE TABLE IF NOT EXISTS hashes (hash TEXT PRIMARY KEY, filepath TEXT)")
+        version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        if version < SCHEMA_VERSION:
+            cursor.execute("DROP TABLE IF EXISTS hashes")
+            cursor.execute("DROP TABLE IF EXISTS file_meta")
+            cursor.execute("DROP TABLE IF EXISTS unhashed")
+            cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            logging.info(f"Reset hash database {db_path} (schema version {version} -> {SCHEMA_VERSION})")
+        cursor.execute("CREATE TABLE IF NOT EXISTS hashes (hash BLOB PRIMARY KEY, filepath TEXT, size INTEGER)")
+        cursor.execute("CREATE TABLE IF NOT EXISTS file_meta (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, hash BLOB)")
+        cursor.execute("CREATE TABLE IF NOT EXISTS unhashed (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER)")
+        cursor.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        row = cursor.execute("SELECT value FROM meta WHERE key = 'hash_algorithm'").fetchone()
+        if row is None or row[0] != HASH_ALGORITHM:
+            cursor.execute("DELETE FROM hashes")
+            cursor.execute("DELETE FROM file_meta")
+            cursor.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('hash_algorithm', ?)", (HASH_ALGORITHM,))
+            if row is not None:
+                logging.info(f"Reset hash database {db_path} (hash algorithm {row[0]} -> {HASH_ALGORITHM})")
         conn.commit()
         return conn
     except sqlite3.Error as e:
@@ -405,42 +1210,284 @@ def initialize_database(db_path="hashes.db"):
         sys.exit(1)
 
 
-def save_hash_to_db(conn, hash_value, filepath, batch_mode=False):
+def open_database_readonly(db_path="hashes.db"):
     """
-    Saves a hash value and its associated file path to the database.
+    Opens the hash database for reading only, as used by a dry run.
 
-    This function inserts a hash value and its corresponding file path into the
-    `hashes` table of the database. If the `batch_mode` parameter is set to False,
-    the changes are committed immediately. Otherwise, the commit is deferred,
-    allowing for batch processing.
+    Unlike `initialize_database`, nothing is created, reset or converted. A
+    database that is missing, unreadable, or written with another schema
+    version or hash algorithm is treated as empty.
 
     Args:
-        conn (sqlite3.Connection): The database connection object.
-        hash_value (str): The hash value to be stored.
+        db_path (str): The path to the SQLite database file. Defaults to "hashes.db".
+
+    Returns:
+        sqlite3.Connection: A read-only connection, or None if there is nothing usable to read.
+    """
+    if not os.path.exists(db_path):
+        return None
+    try:
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            row = None
+            if version == SCHEMA_VERSION:
+                row = conn.execute("SELECT value FROM meta WHERE key = 'hash_algorithm'").fetchone()
+            if row is not None and row[0] == HASH_ALGORITHM:
+                return conn
+        except sqlite3.Error:
+            pass
+        conn.close()
+        logging.info(f"Dry-run: ignoring hash database {db_path} (other schema version or hash algorithm)")
+    except sqlite3.Error as e:
+        logging.error(f"Error opening database {db_path}: {e}")
+    return None
+
+
+def new_pending():
+    """
+    Creates an empty queue of rows waiting to be written to the database.
+
+    Returns:
+        dict: Maps each table name in PENDING_SQL to a list of rows.
+    """
+    return {table: [] for table in PENDING_SQL}
+
+
+def pending_count(pending):
+    """
+    Returns the number of rows waiting to be written to the database.
+    """
+    return sum(len(rows) for rows in pending.values())
+
+
+def save_hash_to_db(pending, hash_value, filepath, size):
+    """
+    Queues a hash value and its associated file path and size for the database.
+
+    Rows are collected in `pending` and written in one transaction by
+    `flush_pending`, instead of executing one INSERT per file.
+
+    Args:
+        pending (dict): The rows waiting to be written (see `new_pending`).
+        hash_value (bytes): The raw digest to be stored.
         filepath (str): The file path associated with the hash value.
-        batch_mode (bool, optional): If True, defers committing the transaction.
-                                     Defaults to False.
+        size (int): The size of the file in bytes.
+    """
+    pending["hashes"].append((hash_value, filepath, size))
 
+
+def save_file_meta_to_db(pending, filepath, size, mtime_ns, hash_value):
     """
-    cursor = conn.cursor()
-    cursor.execute("INSERT OR IGNORE INTO hashes (hash, filepath) VALUES (?, ?)", (hash_value, filepath))
-    if not batch_mode:
-        conn.commit()
+    Queues the size, modification time and hash of a file for the `file_meta` cache.
+
+    Args:
+        pending (dict): The rows waiting to be written (see `new_pending`).
+        filepath (str): The absolute path of the file.
+        size (int): The size of the file in bytes.
+        mtime_ns (int): The modification time of the file in nanoseconds.
+        hash_value (bytes): The raw digest of the file.
+    """
+    pending["file_meta"].append((filepath, size, mtime_ns, hash_value))
+
+
+def save_unhashed_to_db(pending, filepath, size, mtime_ns):
+    """
+    Queues a file that was copied without being hashed.
+
+    Its size is enough to tell a later run that a new file of the same size
+    may be a duplicate, in which case both files are hashed then. With the
+    modification time, a rescan can tell that the file is unchanged.
+
+    Args:
+        pending (dict): The rows waiting to be written (see `new_pending`).
+        filepath (str): The absolute path of the file.
+        size (int): The size of the file in bytes.
+        mtime_ns (int): The modification time of the file in nanoseconds.
+    """
+    pending["unhashed"].append((filepath, size, mtime_ns))
+
+
+def delete_unhashed_from_db(pending, filepath):
+    """
+    Queues the removal of an unhashed file once it has been hashed (or is gone).
+
+    Args:
+        pending (dict): The rows waiting to be written (see `new_pending`).
+        filepath (str): The absolute path of the file.
+    """
+    pending["unhashed_delete"].append((filepath,))
+
+
+def queued_path(pending, hash_value):
+    """
+    Looks up the path of a hash that is queued but not yet written to the database.
+
+    Only needed when `load_path_from_db` finds nothing, so the batch is
+    not committed early just to look one hash up.
+
+    Args:
+        pending (dict): The rows waiting to be written (see `new_pending`).
+        hash_value (bytes): The raw digest to look up.
+
+    Returns:
+        str: The file path, or None if the hash is not queued.
+    """
+    for h, filepath, _ in pending["hashes"]:
+        if h == hash_value:
+            return filepath
+    return None
+
+
+def flush_pending(conn, pending):
+    """
+    Writes all queued rows to the database in a single transaction.
+
+    Args:
+        conn (sqlite3.Connection): The database connection object.
+        pending (dict): The rows waiting to be written. Cleared on success.
+    """
+    if not pending_count(pending):
+        return
+    with conn:  # Commits on success, rolls back on error
+        for table, rows in pending.items():
+            if rows:
+                conn.executemany(PENDING_SQL[table], rows)
+    for rows in pending.values():
+        rows.clear()
 
 
 def load_hashes_from_db(conn):
     """
-    Loads file hashes and their corresponding file paths from the database.
+    Loads the file hashes stored in the database.
+
+    Only the digests are loaded; the file paths stay in the database and can be
+    looked up with `load_path_from_db` when needed.
+
+    Args:
+        conn (sqlite3.Connection): A connection object to the SQLite database.
+
+    Returns:
+        set: The raw file digests (bytes).
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT hash FROM hashes")
+    return {h for (h,) in cursor.fetchall()}
+
+
+def load_path_from_db(conn, hash_value):
+    """
+    Looks up the path of the first file stored with the given hash.
+
+    Args:
+        conn (sqlite3.Connection): A connection object to the SQLite database.
+        hash_value (bytes): The raw digest to look up.
+
+    Returns:
+        str: The file path, or None if the hash is not stored.
+    """
+    row = conn.execute("SELECT filepath FROM hashes WHERE hash = ?", (hash_value,)).fetchone()
+    return row[0] if row else None
+
+
+def load_sizes_from_db(conn):
+    """
+    Loads the distinct file sizes of previously hashed files from the database.
+
+    Args:
+        conn (sqlite3.Connection): A connection object to the SQLite database.
+
+    Returns:
+        set: The file sizes (int) that have at least one stored hash.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT DISTINCT size FROM hashes")
+    return {size for (size,) in cursor.fetchall()}
+
+
+def load_unhashed_from_db(conn, sizes):
+    """
+    Loads the files copied without a hash in earlier runs, for the given sizes.
+
+    Args:
+        conn (sqlite3.Connection): A connection object to the SQLite database.
+        sizes (collections.abc.Container): The sizes of interest; other rows are not kept.
+
+    Returns:
+        dict: Maps each size (int) to a list of (path, mtime_ns) tuples.
+    """
+    unhashed = defaultdict(list)
+    for path, size, mtime_ns in conn.execute("SELECT path, size, mtime_ns FROM unhashed"):
+        if size in sizes:
+            unhashed[size].append((path, mtime_ns))
+    return unhashed
+
+
+def load_known_sizes(conn, size_to_paths):
+    """
+    Finds the sizes in this scan that match a file recorded by an earlier run.
+
+    Previously hashed files count through their stored hashes. Files copied
+    without a hash count too, unless they are part of this scan themselves;
+    those from elsewhere are returned so they can be hashed for comparison.
 
     Args:
         conn (sqlite3.Connection): A connection object to the SQLite database.
+        size_to_paths (dict): Maps each size in this scan to its file paths.
 
     Returns:
-        dict: A dictionary where the keys are file hashes (str) and the values are file paths (str).
+        tuple: (known_sizes, stored_to_hash, stored_in_scan) where known_sizes is
+               a set of sizes, stored_to_hash a list of (path, size) tuples of
+               unhashed files outside this scan, and stored_in_scan maps each
+               path of this scan that was recorded as unhashed to its
+               recorded mtime_ns.
+    """
+    known_sizes = load_sizes_from_db(conn)
+    stored_to_hash = []
+    stored_in_scan = {}
+    for size, rows in load_unhashed_from_db(conn, size_to_paths).items():
+        in_scan = set(size_to_paths[size])
+        for path, mtime_ns in rows:
+            if path in in_scan:
+                stored_in_scan[path] = mtime_ns
+            else:
+                stored_to_hash.append((path, size))
+                known_sizes.add(size)
+    return known_sizes, stored_to_hash, stored_in_scan
+
+
+def load_file_meta_from_db(conn):
+    """
+    Loads the cached size, modification time and hash of previously hashed files.
+
+    Args:
+        conn (sqlite3.Connection): A connection object to the SQLite database.
+
+    Returns:
+        dict: Maps each file path (str) to a (size, mtime_ns, hash) tuple.
     """
     cursor = conn.cursor()
-    cursor.execute("SELECT hash, filepath FROM hashes")
-    return dict(cursor.fetchall())
+    cursor.execute("SELECT path, size, mtime_ns, hash FROM file_meta")
+    return {path: (size, mtime_ns, h) for path, size, mtime_ns, h in cursor.fetchall()}
+
+
+def lookup_cached_hash(file_meta, filepath, size, mtime_ns):
+    """
+    Returns the stored hash of a file if it has not changed since it was hashed.
+
+    Args:
+        file_meta (dict): The cache returned by `load_file_meta_from_db`.
+        filepath (str): The absolute path of the file.
+        size (int): The current size of the file in bytes.
+        mtime_ns (int): The current modification time of the file in nanoseconds.
+
+    Returns:
+        bytes: The cached digest, or None if the file is unknown or has changed.
+    """
+    meta = file_meta.get(filepath)
+    if meta is not None and meta[0] == size and meta[1] == mtime_ns:
+        return meta[2]
+    return None
 
 
 def organize_unique_files_by_type(unique_dir):
@@ -461,64 +1508,29 @@ def organize_unique_files_by_type(unique_dir):
                 logging.info(f"Moved {filename} to {type_dir}")
 
 
-def organize_unique_files_by_group(unique_dir):
+def unique_group_dir(filepath):
     """
-    Organizes files in the UniqueFiles directory into subdirectories by file type groups.
+    Returns the UniqueFiles subdirectory for a file's type group.
 
-    Args:
-        unique_dir (str): Path to the UniqueFiles directory.
-    """
-    # Define file type groups
-    file_type_groups = {
-        "Documents": {".txt", ".log", ".md", ".csv", ".json", ".xml", ".html", ".css", ".js",
-                      ".doc", ".docx", ".pdf", ".ppt", ".pptx", ".xls", ".xlsx"},
-        "Images": {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tiff", ".webp"},
-        "Audio": {".mp3", ".wav", ".flac", ".aac", ".ogg", ".wma"},
-        "Videos": {".mp4", ".avi", ".mov", ".wmv", ".flv", ".mkv", ".mpg", ".mpeg"},
-        "Archives": {".zip", ".tar", ".gz", ".bz2", ".xz", ".rar", ".7z"},
-        "Executables": {".exe", ".msi", ".apk", ".dmg", ".iso", ".bin", ".img"},
-        "Code": {".py", ".java", ".c", ".cpp", ".h", ".cs", ".go", ".rb"},
-        "Fonts": {".ttf", ".otf", ".woff", ".woff2", ".eot", ".svgz"},
-        "3DPrinting": {".stl", ".obj", ".gcode"},
-        "Other": set()  # Catch-all for files that don't match any group
-    }
+    Unique files are copied straight into their group, so they are written
+    to their final location once instead of being moved after the scan.
 
-    # Iterate over files in the UniqueFiles directory
-    for filename in os.listdir(unique_dir):
-        file_path = os.path.join(unique_dir, filename)
-        if os.path.isfile(file_path):
-            ext = os.path.splitext(filename)[1].lower()  # Get the file extension
-            group = "Other"  # Default group
-
-            logging.debug(f"Processing file: {filename} with extension: {ext}")
-
-            # Find the group for the file extension
-            for group_name, extensions in file_type_groups.items():
-                if ext in extensions:
-                    group = group_name
-                    break
-
-            # Create the group directory if it doesn't exist
-            group_dir = os.path.join(unique_dir, group)
-            os.makedirs(group_dir, exist_ok=True)
+    Args:
+        filepath (str): Path to the file.
 
-            # Move the file into the group directory
-            try:
-                shutil.move(file_path, os.path.join(group_dir, filename))
-                logging.info(f"Moved {filename} to {group_dir}")
-            except Exception as e:
-                logging.error(f"Error moving {filename} to {group_dir}: {e}")
-        else:
-            logging.warning(f"Skipping non-file item: {filename}")
+    Returns:
+        str: The group directory, e.g. UniqueFiles/Images ("Other" if no group matches).
+    """
+    ext = os.path.splitext(filepath)[1].lower()
+    return os.path.join(UNIQUE_DIR, EXT_TO_GROUP.get(ext, "Other"))
 
 
-def clear_hash_storage(db_path="hashes.db", progress_file="hashes.pkl"):
+def clear_hash_storage(db_path="hashes.db"):
     """
-    Clears the hash database and progress file.
+    Clears the hash database.
 
     Args:
         db_path (str): Path to the SQLite database file.
-        progress_file (str): Path to the progress file.
     """
     # Remove the database file
     if os.path.exists(db_path):
@@ -527,12 +1539,11 @@ def clear_hash_storage(db_path="hashes.db", progress_file="hashes.pkl"):
     else:
         logging.info(f"No database file found to delete: {db_path}")
 
-    # Remove the progress file
-    if os.path.exists(progress_file):
-        os.remove(progress_file)
-        logging.info(f"Deleted progress file: {progress_file}")
-    else:
-        logging.info(f"No progress file found to delete: {progress_file}")
+    # Remove the WAL sidecar files left behind by an interrupted run
+    for sidecar in (db_path + "-wal", db_path + "-shm"):
+        if os.path.exists(sidecar):
+            os.remove(sidecar)
+            logging.info(f"Deleted database file: {sidecar}")
 
 
 if __name__ == "__main__":
@@ -554,8 +1565,19 @@ if __name__ == "__main__":
     os.makedirs(UNIQUE_DIR, exist_ok=True)
     os.makedirs(DUPLICATE_DIR, exist_ok=True)
 
-    # Convert extensions to a set
-    FILE_EXTENSIONS = set(args.extensions)
+    HASH_ALGORITHM = args.hash
+    if HASH_ALGORITHM == "blake3" and blake3 is None:
+        print("Error: --hash blake3 requires the 'blake3' package (pip install blake3).")
+        sys.exit(1)
+
+    # Parallel reads only help on SSDs; on a hard disk they just add seeking
+    if args.jobs is None:
+        args.jobs = 1 if is_rotational(ROOT_DIR) else (os.cpu_count() or 1)
+    HASH_WORKERS = max(1, args.jobs)
+
+    # Convert extensions to a lowercase frozenset; "jpg" and ".jpg" both mean ".jpg",
+    # since is_valid_file compares the suffix including its dot
+    FILE_EXTENSIONS = frozenset("." + ext.lstrip(".").lower() for ext in args.extensions)
 
     # Check if root directory exists
     if not os.path.exists(ROOT_DIR):
@@ -567,13 +1589,18 @@ if __name__ == "__main__":
         print("Insufficient disk space on the output drive.")
         sys.exit(1)
 
+    # Files can be hardlinked instead of copied when both are on one filesystem
+    SAME_FS = os.stat(ROOT_DIR).st_dev == os.stat(OUTPUT_DIR).st_dev
+    if args.link_mode == "auto":
+        LINK_MODE = "hardlink" if SAME_FS else "copy"
+    else:
+        LINK_MODE = args.link_mode
+    LAYOUT = args.layout
+
     # Start the scan
     print("Starting scan...")
     processed_files, skipped_files = scan_and_copy_files(ROOT_DIR, FILE_EXTENSIONS)
 
-    # Organize the UniqueFiles folder by file type groups
-    organize_unique_files_by_group(UNIQUE_DIR)
-
     print("Scan complete.")
     print(f"Total files processed: {processed_files}")
     print(f"Unique files copied to: {UNIQUE_DIR}")
@@ -12,16 +12,24 @@ def generate_fake_files(root_dir, file_types, num_files=100):
         num_files (int): The total number of files to generate.
     """
     os.makedirs(root_dir, exist_ok=True)
-    for _ in range(num_files):
-        # Generate a random filename
-        filename = ''.join(random.choices(string.ascii_letters + string.digits, k=8))
-        ext = random.choice(file_types)
-        file_path = os.path.join(root_dir, f"{filename}{ext}")
+    alphabet = string.ascii_letters + string.digits
+
+    # Generate all filenames and random content up front: one RNG call each,
+    # instead of two random.choices calls per file
+    chars = "".join(random.choices(alphabet, k=8 * num_files))
+    exts = random.choices(file_types, k=num_files)
+    payload = os.urandom(100 * num_files)  # 100 random bytes per file keeps every file unique
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0)
+
+    for i, ext in enumerate(exts):
+        file_path = os.path.join(root_dir, f"{chars[8 * i:8 * i + 8]}{ext}")
 
         # Write some dummy content to the file
-        with open(file_path, "w") as f:
-            f.write(f"This is a test file with extension {ext}.\n")
-            f.write("".join(random.choices(string.ascii_letters + string.digits, k=100)))
+        fd = os.open(file_path, flags, 0o644)
+        try:
+            os.write(fd, f"This is a test file with extension {ext}.\n".encode() + payload[100 * i:100 * i + 100])
+        finally:
+            os.close(fd)
 
     print(f"Generated {num_files} fake files in {root_dir}")
 